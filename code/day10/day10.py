@@ -63,6 +63,15 @@ AoC 2017 becomes 33efeb34ea91902bb2f59c9920caa6cd.
 1,2,4 becomes 63960835bcdc130f0b66d7ff4f6a5a8e.
 Treating your puzzle input as a string of ASCII characters, what is the Knot Hash of your puzzle input? Ignore any leading or trailing whitespace you might encounter.
 """
+import dbm
+import operator
+import sys
+import timeit
+from collections import OrderedDict
+from functools import reduce
+import numpy as np
+
+SPEC_INSTRUCTIONS = [17, 31, 73, 47, 23]
 
 
 def input_reader(file):
@@ -105,35 +114,43 @@ def circle_hash(instructions, circle_length=256):
     return(circle)
 
 
-def iterable_xor(iterable):
-    xored = iterable[0] ^ iterable[1]
-    for i in range(2, len(iterable)):
-        xored = xored ^ iterable[i]
-    return(xored)
+def rotating_circle_hash(instructions, circle_length=256):
+    # The frame is only rotated when a reversal would wrap, so each reversal is a single contiguous slice
+    circle = bytearray(range(0, circle_length)) if circle_length <= 256 else list(range(0, circle_length))
+    offset = 0
+    pos = 0
+    skip_size = 0
+    for length in instructions:
+        if length > circle_length:
+            continue
+
+        if pos + length > circle_length:
+            circle = circle[pos:] + circle[:pos]
+            offset = (offset + pos) % circle_length
+            pos = 0
+        circle[pos:pos + length] = circle[pos:pos + length][::-1]
+
+        pos = (pos + length + skip_size) % circle_length
+        skip_size += 1
+    return(list(circle[circle_length - offset:] + circle[:circle_length - offset]))
 
 
-def convert_to_hex(num):
-    assert num >= 0
-    num_hex = hex(num)
-    num_hex = '0' + num_hex[2:] if len(num_hex[2:]) < 2 else num_hex[2:]
-    assert len(num_hex) == 2
-    return(num_hex)
+HASH_ENGINES = {'slice': circle_hash, 'rotating': rotating_circle_hash}
 
 
-def densify(sparse_hash, length=16):
+def densify_bytes(sparse_hash, length=16):
     n_elems = len(sparse_hash)
     assert n_elems % length == 0
+    return(bytes(reduce(operator.xor, sparse_hash[i:i + length]) for i in range(0, n_elems, length)))
 
-    segments = (sparse_hash[i*length:(i+1)*length] for i in range(0, int(n_elems/length)))
-    xors = (iterable_xor(segment) for segment in segments)
-    hex_val = ''.join([convert_to_hex(xor) for xor in xors])
-    return(hex_val)
+
+def densify(sparse_hash, length=16):
+    return(densify_bytes(sparse_hash, length).hex())
 
 
 def ascii_instructions(ascii_seed, repetitions=64):
-    spec_instructions = [17, 31, 73, 47, 23]
     instructions = [ord(char) for char in ascii_seed]
-    instructions.extend(spec_instructions)
+    instructions.extend(SPEC_INSTRUCTIONS)
     repeat = 0
     while repeat < repetitions:
         for instruction in instructions:
@@ -141,11 +158,131 @@ def ascii_instructions(ascii_seed, repetitions=64):
         repeat += 1
 
 
-def dense_hash(input_str, dense_length=16, circle_length=256, repetitions=64):
+def raw_dense_hash(input_str, dense_length=16, circle_length=256, repetitions=64, engine='rotating'):
     instructions = ascii_instructions(input_str, repetitions)
-    sparse_hash = circle_hash(instructions, circle_length)
-    dense_hash = densify(sparse_hash, dense_length)
-    return(dense_hash)
+    sparse_hash = HASH_ENGINES[engine](instructions, circle_length)
+    return(densify_bytes(sparse_hash, dense_length))
+
+
+def dense_hash(input_str, dense_length=16, circle_length=256, repetitions=64, engine='rotating'):
+    return(raw_dense_hash(input_str, dense_length, circle_length, repetitions, engine).hex())
+
+
+class hash_cache():
+    # Bounded LRU of dense hashes, optionally backed by a dbm file that persists across runs
+    def __init__(self, maxsize=2**16, file=None):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.store = dbm.open(file, 'c') if file else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def dense_hash(self, input_str, dense_length=16, circle_length=256, repetitions=64):
+        if isinstance(input_str, (bytes, bytearray)):
+            input_str = input_str.decode('latin-1')
+        elif not isinstance(input_str, str):
+            input_str = ''.join(input_str)
+        key = repr((input_str, dense_length, circle_length, repetitions))
+
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return(self.entries[key])
+
+        if self.store is not None and key in self.store:
+            self.disk_hits += 1
+            value = self.store[key].decode('ascii')
+        else:
+            self.misses += 1
+            value = dense_hash(input_str, dense_length, circle_length, repetitions)
+            if self.store is not None:
+                self.store[key] = value
+
+        self.entries[key] = value
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return(value)
+
+    def hit_rate(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return((self.hits + self.disk_hits) / lookups if lookups else 0.0)
+
+
+def batch_circle_hash(instruction_rows, circle_length=256, repetitions=1):
+    # Runs one knot hash per row of a (keys, steps) array, repeating the steps `repetitions` times. Each row
+    # is kept in a rotating frame with its current position at column 0, so a step is a prefix reversal then
+    # a rotation by length + skip. Rows sharing (length, shift) at a step are moved together with column slices.
+    n_keys = instruction_rows.shape[0]
+    dtype = np.uint8 if circle_length <= 256 else np.int32
+    circle = np.tile(np.arange(0, circle_length, dtype=dtype), (n_keys, 1))
+    offset = np.zeros(n_keys, dtype=np.int64)
+    skip_size = np.zeros(n_keys, dtype=np.int64)
+    columns = [np.asarray(lengths, dtype=np.int64) for lengths in np.asarray(instruction_rows).T]
+    for lengths in columns * repetitions:
+        valid = lengths <= circle_length
+        shifts = (lengths + skip_size) % circle_length
+        codes = np.where(valid, lengths * circle_length + shifts, -1)
+        order = np.argsort(codes, kind='stable')
+        for group in np.split(order, np.flatnonzero(np.diff(codes[order])) + 1):
+            code = int(codes[group[0]])
+            if code < 0:
+                continue
+            length, shift = divmod(code, circle_length)
+            rows = slice(None) if len(group) == n_keys else group
+
+            block = circle[rows]
+            if length:
+                block[:, :length] = block[:, length - 1::-1]
+            rotated = np.empty_like(block)
+            rotated[:, :circle_length - shift] = block[:, shift:]
+            rotated[:, circle_length - shift:] = block[:, :shift]
+            circle[rows] = rotated
+
+        offset = np.where(valid, (offset + shifts) % circle_length, offset)
+        skip_size += valid
+
+    frame = (np.arange(0, circle_length)[None, :] - offset[:, None]) % circle_length
+    return(np.take_along_axis(circle, frame, axis=1))
+
+
+def batch_dense_hash(keys, dense_length=16, circle_length=256, repetitions=64, raw=False, batch_size=2**14):
+    # Keys with equal instruction counts are hashed together in batches of bounded size
+    groups = {}
+    for i, key in enumerate(keys):
+        instructions = list(key) if isinstance(key, (bytes, bytearray)) else [ord(char) for char in key]
+        groups.setdefault(len(instructions), []).append((i, instructions + SPEC_INSTRUCTIONS))
+
+    digests = [None] * sum(len(group) for group in groups.values())
+    for group in groups.values():
+        for start in range(0, len(group), batch_size):
+            batch = group[start:start + batch_size]
+            instruction_rows = np.array([instructions for i, instructions in batch], dtype=np.int64)
+            sparse_hashes = batch_circle_hash(instruction_rows, circle_length, repetitions)
+            dense_hashes = np.bitwise_xor.reduce(sparse_hashes.reshape(len(batch), -1, dense_length), axis=2)
+            for (i, instructions), digest in zip(batch, dense_hashes.astype(np.uint8)):
+                digests[i] = digest.tobytes() if raw else digest.tobytes().hex()
+    return(digests)
+
+
+def benchmark_engines(n_keys=2000):
+    keys = ['benchmark-{}'.format(i) for i in range(0, n_keys)]
+    for engine in HASH_ENGINES:
+        elapsed = timeit.timeit(lambda: [dense_hash(key, engine=engine) for key in keys], number=1)
+        print(engine, '{:.0f} keys/s'.format(n_keys / elapsed))
+    elapsed = timeit.timeit(lambda: batch_dense_hash(keys), number=1)
+    print('batch', '{:.0f} keys/s'.format(n_keys / elapsed))
 
 
 if __name__ == "__main__":
@@ -154,6 +291,20 @@ if __name__ == "__main__":
     assert dense_hash('1,2,3') == "3efbe78a8d82f29979031a4aa0b16a9d"
     assert dense_hash('1,2,4') == "63960835bcdc130f0b66d7ff4f6a5a8e"
     assert dense_hash('AoC 2017') == "33efeb34ea91902bb2f59c9920caa6cd"
+    assert dense_hash('', engine='slice') == dense_hash('') == "a2582a3a0e66e6e86e3812dcb672a272"
+    assert rotating_circle_hash([3, 4, 1, 5], 5) == [3, 4, 2, 1, 0]
+    assert raw_dense_hash('AoC 2017') == bytes.fromhex("33efeb34ea91902bb2f59c9920caa6cd")
+    assert densify([65, 27, 9, 1, 4, 3, 40, 50, 91, 7, 6, 0, 2, 5, 68, 22]) == '40'
+    assert batch_dense_hash(['1,2,3', b'AoC 2017', '']) == [dense_hash('1,2,3'), dense_hash('AoC 2017'), dense_hash('')]
+    assert batch_dense_hash([b'1,2,4'], raw=True) == [bytes.fromhex(dense_hash('1,2,4'))]
+
+    cache = hash_cache(maxsize=1)
+    assert cache.dense_hash('1,2,3') == cache.dense_hash(b'1,2,3') == dense_hash('1,2,3')
+    assert cache.dense_hash('1,2,4') == dense_hash('1,2,4')
+    assert (cache.hits, cache.misses, cache.hit_rate()) == (1, 2, 1 / 3)
+
+    if '--benchmark' in sys.argv:
+        benchmark_engines()
 
 
 
@@ -30,6 +30,15 @@ se,sw,se,sw,sw is 3 steps away (s,s,sw).
 How many steps away is the furthest he ever got from his starting position?
 
 """
+import itertools
+import mmap
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+MOVE_NAMES = ['n', 'ne', 'se', 's', 'sw', 'nw']
+AXIAL_DELTAS = np.array([[1, -1], [1, 0], [0, 1], [-1, 1], [-1, 0], [0, -1]], dtype=np.int64)
 
 
 def input_loader(file):
@@ -61,6 +70,157 @@ def hex_distance(a, b):
     return (abs(a[0] - b[0]) + abs(sum(a) - sum(b)) + abs(a[1] - b[1])) / 2
 
 
+def encode_moves(instructions):
+    names = np.array(instructions)
+    codes = np.full(len(names), -1, dtype=np.int8)
+    for code, name in enumerate(MOVE_NAMES):
+        codes[names == name] = code
+    if (codes < 0).any():
+        raise KeyError(names[codes < 0][0])
+    return(codes)
+
+
+def vectorized_traverse_grid(instructions, initial_position=[0, 0], chunk_size=2**20):
+    # Walks the path in chunks of bounded size, taking a cumsum of axial deltas per chunk
+    instructions = iter(instructions)
+    displacement = np.zeros(2, dtype=np.int64)
+    max_dist = 0
+    while True:
+        chunk = list(itertools.islice(instructions, chunk_size))
+        if not chunk:
+            break
+        path = np.cumsum(AXIAL_DELTAS[encode_moves(chunk)], axis=0) + displacement
+        distances = (np.abs(path[:, 0]) + np.abs(path.sum(axis=1)) + np.abs(path[:, 1])) / 2
+        max_dist = max(max_dist, float(distances.max()))
+        displacement = path[-1]
+
+    current_location = [int(i + j) for i, j in zip(initial_position, displacement)]
+    return((current_location, max_dist))
+
+
+def summarise_moves(file, start, end):
+    # A move belongs to the chunk its first byte falls in; returns move counts and the extremes
+    # of the chunk's prefix positions along each of the three hex axes
+    with open(file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        size = len(mapped)
+        if start > 0 and mapped[start - 1:start] != b',':
+            start = mapped.find(b',', start) + 1 or size
+        stop = mapped.find(b',', end - 1) if end < size else size
+        stop = size if stop < 0 else stop
+        chunk = mapped[start:max(start, stop)].decode('ascii').strip().lower()
+
+    counts = np.zeros(len(MOVE_NAMES), dtype=np.int64)
+    extremes = None
+    if chunk:
+        codes = encode_moves(chunk.split(','))
+        counts += np.bincount(codes, minlength=len(MOVE_NAMES))
+        path = np.cumsum(AXIAL_DELTAS[codes], axis=0)
+        axes = np.column_stack([path, path.sum(axis=1)])
+        extremes = (axes.min(axis=0), axes.max(axis=0))
+    return((counts, extremes))
+
+
+def counts_distance(counts):
+    return(hex_distance([0, 0], [int(i) for i in counts @ AXIAL_DELTAS]))
+
+
+def parallel_distance_traversed(file, chunk_size=2**20, max_workers=None):
+    file_size = os.path.getsize(file)
+    starts = range(0, file_size, chunk_size)
+    ends = [min(start + chunk_size, file_size) for start in starts]
+    with ProcessPoolExecutor(max_workers) as pool:
+        summaries = list(pool.map(summarise_moves, itertools.repeat(file), starts, ends))
+
+    counts = np.zeros(len(MOVE_NAMES), dtype=np.int64)
+    max_dist = 0
+    for chunk_counts, extremes in summaries:
+        if extremes is not None:
+            # Distance is the largest absolute coordinate along the three axes, offset by the position so far
+            q, r = counts @ AXIAL_DELTAS
+            offsets = np.array([q, r, q + r])
+            lows, highs = extremes
+            max_dist = max(max_dist, float(np.maximum(offsets + highs, -(offsets + lows)).max()))
+        counts += chunk_counts
+
+    return((counts_distance(counts), max_dist))
+
+
+class path_index():
+    # Cumulative axial positions after every step (step 0 is the origin) with each step's distance from the
+    # origin and the running maximum, all int32. With `file`, the three arrays are written chunk by chunk to
+    # `file`, `file + '.distances'` and `file + '.running_max'` and memory-mapped back.
+    def __init__(self, instructions, file=None, chunk_size=2**20):
+        chunks = self.index_chunks(instructions, chunk_size)
+        if file:
+            files = [file, file + '.distances', file + '.running_max']
+            try:
+                with open(files[0], 'wb') as positions, open(files[1], 'wb') as distances, \
+                        open(files[2], 'wb') as running_max:
+                    for chunk in chunks:
+                        for array, out in zip(chunk, (positions, distances, running_max)):
+                            array.tofile(out)
+            except BaseException:
+                for name in files:
+                    if os.path.exists(name):
+                        os.remove(name)
+                raise
+            self.positions = np.memmap(files[0], dtype=np.int32, mode='r').reshape(-1, 2)
+            self.distances = np.memmap(files[1], dtype=np.int32, mode='r')
+            self.running_max = np.memmap(files[2], dtype=np.int32, mode='r')
+        else:
+            self.positions, self.distances, self.running_max = (np.concatenate(arrays) for arrays in zip(*chunks))
+        self.sparse_table = None
+
+    @staticmethod
+    def index_chunks(instructions, chunk_size):
+        instructions = iter(instructions)
+        yield((np.zeros((1, 2), dtype=np.int32), np.zeros(1, dtype=np.int32), np.zeros(1, dtype=np.int32)))
+        displacement = np.zeros(2, dtype=np.int64)
+        max_dist = 0
+        while True:
+            chunk = list(itertools.islice(instructions, chunk_size))
+            if not chunk:
+                break
+            path = np.cumsum(AXIAL_DELTAS[encode_moves(chunk)], axis=0) + displacement
+            displacement = path[-1]
+            distances = ((np.abs(path[:, 0]) + np.abs(path.sum(axis=1)) + np.abs(path[:, 1])) // 2).astype(np.int32)
+            running_max = np.maximum(np.maximum.accumulate(distances), max_dist)
+            max_dist = running_max[-1]
+            yield((path.astype(np.int32), distances, running_max))
+
+    def __len__(self):
+        return(len(self.positions) - 1)
+
+    def position(self, k):
+        return([int(i) for i in self.positions[k]])
+
+    def distance_between(self, i, j):
+        delta = self.positions[j].astype(np.int64) - self.positions[i]
+        return((np.abs(delta[..., 0]) + np.abs(delta.sum(axis=-1)) + np.abs(delta[..., 1])) // 2)
+
+    def distance(self, k):
+        return(int(self.distances[k]))
+
+    def max_distance(self, i, j):
+        # Sparse table over distances; the range [i, j) is covered by two overlapping power-of-two spans
+        if not 0 <= i < j <= len(self.distances):
+            raise ValueError('step range [{}, {}) must be non-empty and within [0, {}]'.format(i, j, len(self.distances)))
+        if self.sparse_table is None:
+            self.sparse_table = [self.distances]
+            span = 1
+            while 2 * span <= len(self.distances):
+                level = self.sparse_table[-1]
+                self.sparse_table.append(np.maximum(level[:-span], level[span:]))
+                span *= 2
+        level = (j - i).bit_length() - 1
+        table = self.sparse_table[level]
+        return(int(max(table[i], table[j - (1 << level)])))
+
+    def first_exceeding(self, d):
+        k = int(np.searchsorted(self.running_max, d, side='right'))
+        return(k if k < len(self.running_max) else None)
+
+
 def distance_traversed(instructions):
     initial_position = [0, 0]
     final_position = traverse_grid(instructions, initial_position)
@@ -71,5 +231,32 @@ if __name__ == "__main__":
     assert distance_traversed(['ne', 'ne', 'ne']) == 3
     assert distance_traversed(['se', 'sw', 'se', 'sw', 'sw']) == 3
 
+    assert vectorized_traverse_grid(input_loader('input.txt'), chunk_size=1000) == traverse_grid(input_loader('input.txt'), return_max_dist=True)
+
+    assert parallel_distance_traversed('input.txt', chunk_size=997) == (distance_traversed(input_loader('input.txt')), 1556)
+
+    index = path_index(input_loader('input.txt'), chunk_size=997)
+    assert index.distance(len(index)) == distance_traversed(input_loader('input.txt'))
+    assert index.max_distance(0, len(index) + 1) == 1556
+    for i, j in [(5, 5), (0, len(index) + 2), (-1, 3)]:
+        try:
+            index.max_distance(i, j)
+            assert False
+        except ValueError:
+            pass
+    assert index.distance(index.first_exceeding(1555)) == 1556
+
+    with tempfile.TemporaryDirectory() as directory:
+        index_file = os.path.join(directory, 'path.index')
+        mapped = path_index(input_loader('input.txt'), file=index_file, chunk_size=997)
+        assert (mapped.distances == index.distances).all() and (mapped.running_max == index.running_max).all()
+        assert mapped.max_distance(0, len(mapped) + 1) == 1556
+        del mapped
+        try:
+            path_index(['n', 'up'], file=index_file)
+            assert False
+        except KeyError:
+            assert os.listdir(directory) == []
+
     print(distance_traversed(input_loader('input.txt')))
     print(traverse_grid(input_loader('input.txt'), return_max_dist=True)[1])
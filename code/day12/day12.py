@@ -32,8 +32,10 @@ Therefore, a total of 6 programs are in this group; all but program 1, which has
 
 How many programs are in the group that contains program ID 0?
 """
-import networkx as nx
-import itertools
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 
 
 def input_loader(file):
@@ -44,25 +46,292 @@ def input_loader(file):
             yield (int(node), edges)
 
 
-def build_graph(node_edge_list):
-    graph = nx.Graph()
+class disjoint_set():
+    # Union-find with path compression and union by rank over integer node ids
+    def __init__(self):
+        self.parents = array('i')
+        self.ranks = array('b')
+        self.sizes = array('i')
+        self.present = bytearray()
+        self.n_components = 0
+
+    def add_node(self, node):
+        if node >= len(self.parents):
+            new_nodes = range(len(self.parents), max(node + 1, 2 * len(self.parents)))
+            self.parents.extend(new_nodes)
+            self.ranks.extend(bytes(len(new_nodes)))
+            self.sizes.extend(array('i', [1]) * len(new_nodes))
+            self.present.extend(bytes(len(new_nodes)))
+        if not self.present[node]:
+            self.present[node] = 1
+            self.n_components += 1
+
+    def find(self, node):
+        parents = self.parents
+        root = node
+        while parents[root] != root:
+            root = parents[root]
+        while parents[node] != root:
+            parents[node], node = root, parents[node]
+        return(root)
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return(False)
+        if self.ranks[root_a] < self.ranks[root_b]:
+            root_a, root_b = root_b, root_a
+        elif self.ranks[root_a] == self.ranks[root_b]:
+            self.ranks[root_a] += 1
+        self.parents[root_b] = root_a
+        self.sizes[root_a] += self.sizes[root_b]
+        self.n_components -= 1
+        return(True)
+
+    def component_size(self, node):
+        return(self.sizes[self.find(node)])
+
+    def reset_nodes(self, nodes):
+        # Splits one whole component back into singletons so it can be relabelled
+        for node in nodes:
+            self.parents[node] = node
+            self.ranks[node] = 0
+            self.sizes[node] = 1
+        self.n_components += len(nodes) - 1
+
+    def component_index(self):
+        roots = np.array([self.find(node) for node in range(0, len(self.parents))], dtype=np.int32)
+        return(component_index(roots, np.frombuffer(self.present, dtype=np.uint8).astype(bool)))
+
+
+class component_index():
+    # Dense node -> component id labels (-1 for unseen nodes) and per-component sizes
+    def __init__(self, roots, present):
+        self.labels = np.full(len(roots), -1, dtype=np.int32)
+        component_roots, self.labels[present] = np.unique(roots[present], return_inverse=True)
+        self.sizes = np.bincount(self.labels[present], minlength=len(component_roots)).astype(np.int32)
+
+    def __len__(self):
+        return(len(self.sizes))
+
+    def component_of(self, nodes):
+        return(self.labels[nodes])
+
+    def component_sizes(self, nodes):
+        labels = self.labels[nodes]
+        return(np.where(labels >= 0, self.sizes[labels], 0))
+
+
+def build_components(node_edge_list):
+    components = disjoint_set()
+    for node, edges in node_edge_list:
+        components.add_node(node)
+        for edge in edges:
+            components.add_node(edge)
+            components.union(node, edge)
+    return(components)
+
+
+def edge_stream(node_edge_list):
     for node, edges in node_edge_list:
-        graph.add_edges_from(itertools.product([node], edges))
-    return(graph)
+        for edge in edges:
+            yield((node, edge))
+
+
+class dynamic_components():
+    # Insertions are unioned straight away. Deleting an edge only matters if it joined two trees in the
+    # union-find forest; then only the component that held it is searched and relabelled, so queries
+    # never need a full recompute.
+    def __init__(self, edges=()):
+        self.components = disjoint_set()
+        self.adjacency = {}
+        self.tree_edges = set()
+        self.insert_edges(edges)
+
+    def insert_edges(self, edges):
+        for a, b in edges:
+            self.adjacency.setdefault(a, Counter())[b] += 1
+            if a != b:
+                self.adjacency.setdefault(b, Counter())[a] += 1
+            self.components.add_node(a)
+            self.components.add_node(b)
+            if self.components.union(a, b):
+                self.tree_edges.add((min(a, b), max(a, b)))
+
+    def delete_edges(self, edges):
+        for a, b in edges:
+            if not self.adjacency.get(a, {}).get(b):
+                raise KeyError((a, b))
+            for x, y in ((a, b), (b, a)) if a != b else ((a, b),):
+                self.adjacency[x][y] -= 1
+                if not self.adjacency[x][y]:
+                    del self.adjacency[x][y]
+            key = (min(a, b), max(a, b))
+            if key in self.tree_edges and not self.adjacency[a].get(b):
+                self.tree_edges.discard(key)
+                self.relabel_component(a, b)
+
+    def spanning_tree(self, start):
+        nodes = [start]
+        seen = {start}
+        tree = []
+        for node in nodes:
+            for neighbour in self.adjacency.get(node, ()):
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    nodes.append(neighbour)
+                    tree.append((node, neighbour))
+        return((nodes, seen, tree))
+
+    def relabel_component(self, a, b):
+        nodes, seen, tree = self.spanning_tree(a)
+        if b not in seen:
+            other_nodes, other_seen, other_tree = self.spanning_tree(b)
+            nodes += other_nodes
+            tree += other_tree
+
+        for node in nodes:
+            for neighbour in self.adjacency.get(node, ()):
+                self.tree_edges.discard((min(node, neighbour), max(node, neighbour)))
+        self.components.reset_nodes(nodes)
+        for x, y in tree:
+            self.components.union(x, y)
+            self.tree_edges.add((min(x, y), max(x, y)))
 
+    def n_components(self):
+        return(self.components.n_components)
 
-def get_num_subgraph_elements(subgraphs, node):
-    for subgraph in subgraphs:
-        if subgraph.has_node(node):
-            return nx.number_of_nodes(subgraph)
+    def component_size(self, node):
+        return(self.components.component_size(node))
+
+
+def parse_pipes(data):
+    # Bulk-parses whole 'a <-> b, c' lines from bytes into int32 (source, target) arrays
+    raw = np.frombuffer(data, dtype=np.uint8)
+    arrows = np.flatnonzero(raw == ord('<'))
+    commas = np.flatnonzero(raw == ord(','))
+    line_lengths = np.bincount(np.searchsorted(arrows, commas) - 1, minlength=len(arrows)) + 2
+    del raw
+    tokens = np.fromstring(data.replace(b'<->', b' ').replace(b',', b' '), dtype=np.int32, sep=' ')
+
+    line_starts = np.cumsum(line_lengths) - line_lengths
+    is_node = np.zeros(len(tokens), dtype=bool)
+    is_node[line_starts] = True
+    sources = np.repeat(tokens[line_starts], line_lengths - 1)
+    return((sources, tokens[~is_node]))
+
+
+def load_csr(file, chunk_size=2**22):
+    # Reads the file in chunks of whole lines into CSR arrays: neighbours[offsets[i]:offsets[i + 1]] are the
+    # pipes of node i. The input already lists every pipe from both ends, so edges are not mirrored.
+    sources, targets = [], []
+    with open(file, 'rb') as f:
+        while True:
+            data = b''.join(f.readlines(chunk_size))
+            if not data:
+                break
+            chunk_sources, chunk_targets = parse_pipes(data)
+            sources.append(chunk_sources)
+            targets.append(chunk_targets)
+    sources = np.concatenate(sources) if sources else np.zeros(0, dtype=np.int32)
+    targets = np.concatenate(targets) if targets else np.zeros(0, dtype=np.int32)
+    return(build_csr(sources, targets))
+
+
+def build_csr(sources, targets):
+    n_nodes = int(max(sources.max(), targets.max())) + 1 if len(sources) else 0
+    order = np.argsort(sources, kind='stable')
+    offsets = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n_nodes), out=offsets[1:])
+    return((offsets, targets[order].astype(np.int32)))
+
+
+def save_csr(csr, prefix):
+    offsets, neighbours = csr
+    np.save(prefix + '_offsets.npy', offsets)
+    np.save(prefix + '_neighbours.npy', neighbours)
+
+
+def open_csr(prefix):
+    return((np.load(prefix + '_offsets.npy', mmap_mode='r'), np.load(prefix + '_neighbours.npy', mmap_mode='r')))
+
+
+def csr_components(offsets, neighbours):
+    # Min-label propagation over the CSR arrays with pointer jumping; returns each node's component label
+    n_nodes = len(offsets) - 1
+    labels = np.arange(0, n_nodes, dtype=np.int32)
+    has_edges = np.diff(offsets) > 0
+    starts = np.asarray(offsets[:-1])[has_edges]
+    while True:
+        updated = labels.copy()
+        if len(starts):
+            updated[has_edges] = np.minimum(labels[has_edges], np.minimum.reduceat(labels[neighbours], starts))
+        np.minimum.at(updated, labels, updated)
+        updated = updated[updated]
+        if (updated == labels).all():
+            return(labels)
+        labels = updated
+
+
+def local_forest(sources, targets):
+    # Compacts a partition of edges to the nodes it touches plus its non-trivial (node, root) pairs
+    components = disjoint_set()
+    for a, b in zip(sources.tolist(), targets.tolist()):
+        components.add_node(a)
+        components.add_node(b)
+        components.union(a, b)
+    present = np.flatnonzero(np.frombuffer(components.present, dtype=np.uint8)).astype(np.int32)
+    roots = np.array([components.find(node) for node in present.tolist()], dtype=np.int32)
+    linked = roots != present
+    return((present, present[linked], roots[linked]))
+
+
+def parallel_components(sources, targets, n_partitions=8, max_workers=None):
+    # Local forests are built per edge partition; their root pairs are labelled in one vectorised CSR pass
+    partitions = zip(np.array_split(sources, n_partitions), np.array_split(targets, n_partitions))
+    with ProcessPoolExecutor(max_workers) as pool:
+        forests = list(pool.map(local_forest, *zip(*partitions)))
+
+    present_nodes = np.concatenate([forest[0] for forest in forests])
+    nodes = np.concatenate([forest[1] for forest in forests])
+    node_roots = np.concatenate([forest[2] for forest in forests])
+    n_nodes = int(present_nodes.max()) + 1 if len(present_nodes) else 0
+    roots = np.arange(0, n_nodes, dtype=np.int32)
+    if len(nodes):
+        labels = csr_components(*build_csr(np.concatenate([nodes, node_roots]), np.concatenate([node_roots, nodes])))
+        roots[:len(labels)] = labels
+    present = np.zeros(n_nodes, dtype=bool)
+    present[present_nodes] = True
+    return(component_index(roots, present))
 
 
 if __name__ == "__main__":
-    graph = build_graph(input_loader('test_input.txt'))
-    subgraphs = nx.connected_component_subgraphs(graph)
-    assert get_num_subgraph_elements(subgraphs, 0) == 6
-
-    graph = build_graph(input_loader('input.txt'))
-    subgraphs = list(nx.connected_component_subgraphs(graph))
-    print(get_num_subgraph_elements(subgraphs, 0))
-    print(len(subgraphs))
+    components = build_components(input_loader('test_input.txt'))
+    assert components.component_size(0) == 6
+    assert components.n_components == 2
+    index = components.component_index()
+    assert list(index.component_sizes([0, 1, 5])) == [6, 1, 6]
+    assert len(index) == components.n_components
+
+    dynamic = dynamic_components(edge_stream(input_loader('test_input.txt')))
+    assert (dynamic.n_components(), dynamic.component_size(0)) == (2, 6)
+    dynamic.delete_edges([(4, 6)])
+    assert dynamic.component_size(0) == 6
+    dynamic.delete_edges([(6, 4)])
+    assert (dynamic.n_components(), dynamic.component_size(0)) == (3, 4)
+    dynamic.insert_edges([(1, 5)])
+    assert (dynamic.n_components(), dynamic.component_size(6)) == (2, 3)
+
+    offsets, neighbours = load_csr('test_input.txt')
+    assert list(neighbours[offsets[2]:offsets[3]]) == [0, 3, 4]
+    labels = csr_components(offsets, neighbours)
+    assert np.bincount(labels)[labels[0]] == 6
+    assert len(np.unique(labels)) == 2
+
+    edges = np.array(list(edge_stream(input_loader('test_input.txt'))), dtype=np.int32)
+    index = parallel_components(edges[:, 0], edges[:, 1], n_partitions=3)
+    assert (len(index), index.component_sizes([0])[0]) == (2, 6)
+
+    components = build_components(input_loader('input.txt'))
+    print(components.component_size(0))
+    print(components.n_components)
@@ -159,8 +159,9 @@ The severity of getting caught on a layer is equal to its depth multiplied by it
 
 Given the details of the firewall you've recorded, if you leave immediately, what is the severity of your whole trip?
 """
-from fractions import gcd
+from math import gcd
 from functools import reduce
+import numpy as np
 
 def load_firewall_paramaters(file):
     params = []
@@ -172,45 +173,43 @@ def load_firewall_paramaters(file):
 
 
 class firewall_layer():
+    # The scanner position is a closed-form function of time, so the layer only tracks the clock
     def __init__(self, _range=None, initial_scanner_location=0):
         self.range = _range
-        self.scanner_location = initial_scanner_location
-        self.forwards = True
+        self.time = initial_scanner_location
 
     def set_range(self, _range):
         self.range = _range
 
     def reset_layer(self):
-        self.forwards = True
-        self.scanner_location = 0
+        self.time = 0
 
-    def advance_scanner(self):
-        if self.forwards:
-            self.scanner_location += 1
-        else:
-            self.scanner_location -= 1
+    def cycle_time(self):
+        return(max(1, 2 * (self.range - 1)) if self.range else 1)
 
-        if self.scanner_location == 0:
-            self.forwards = True
-        elif self.scanner_location + 1 == self.range:
-            self.forwards = False
+    def scanner_position(self, time):
+        phase = time % self.cycle_time()
+        return(phase if not self.range or phase < self.range else self.cycle_time() - phase)
 
-    def reverse_scanner(self):
-        if self.scanner_location + 1 == self.range:
-            self.forwards = True
-        elif self.scanner_location == 0:
-            self.forwards = False
+    @property
+    def scanner_location(self):
+        return(self.scanner_position(self.time))
 
-        if self.forwards:
-            self.scanner_location -= 1
-        else:
-            self.scanner_location += 1
+    @property
+    def forwards(self):
+        return(self.time % self.cycle_time() < (self.range or 1) - 1)
 
-    def intruder_detected(self, location):
+    def advance_scanner(self):
+        self.time += 1
+
+    def reverse_scanner(self):
+        self.time -= 1
+
+    def intruder_detected(self, location, time=None):
         if not self.range:
             return False
         else:
-            return location == self.scanner_location
+            return location == self.scanner_position(self.time if time is None else time)
 
 
 class firewall():
@@ -221,25 +220,29 @@ class firewall():
             self.layers[depth].set_range(_range)
 
         self.depth = len(self.layers)
+        self.time = 0
 
     def get_layer_range(self, layer):
         return(self.layers[layer].range)
 
     def advance_time(self):
+        self.time += 1
         for layer in self.layers:
             layer.advance_scanner()
 
     def regress_time(self):
+        self.time -= 1
         for layer in self.layers:
             layer.reverse_scanner()
 
-    def check_for_detection(self, layer, location):
+    def check_for_detection(self, layer, location, time=None):
         if layer < self.depth:
-            return self.layers[layer].intruder_detected(location)
+            return self.layers[layer].intruder_detected(location, time)
         else:
             return False
 
     def reset_firewall(self):
+        self.time = 0
         for layer in self.layers:
             layer.reset_layer()
 
@@ -271,27 +274,24 @@ class packet():
             self.packet_detections.append(detection)
         return(detected)
 
+    def trip_detections(self, delay=0):
+        # Layers that would catch the packet if it entered the firewall after waiting `delay` ticks from now
+        start = self.firewall.time + delay - self.packet_depth_loc
+        return([{'layer': layer, 'range': self.firewall.get_layer_range(layer)}
+                for layer in range(self.packet_depth_loc, self.firewall.depth)
+                if self.firewall.check_for_detection(layer, self.packet_layer_loc, start + layer)])
+
+    def is_caught(self, delay=0):
+        start = self.firewall.time + delay - self.packet_depth_loc
+        return(any(self.firewall.check_for_detection(layer, self.packet_layer_loc, start + layer)
+                   for layer in range(self.packet_depth_loc, self.firewall.depth)))
+
     def find_shortest_wait(self):
+        # Measured from a fresh start (packet before layer 0 at time 0), whatever the current state
         wait_counter = 0
-        escaped = False
-        self.reset()
-        while not escaped:
-            detected = False
-            while self.packet_depth_loc < self.firewall.depth:
-                if self.check_for_detection() and self.packet_depth_loc > 0:
-                    detected = True
-                    break
-                self.advance_time()
-
-            if not detected:
-                escaped = True
-            else:
-                self.reset()
-                wait_counter += 1
-                [self.wait() for i in range(0, wait_counter)]
-
-            if wait_counter % 50 == 0:
-                print('attempt', wait_counter)
+        while any(self.firewall.check_for_detection(layer, self.packet_layer_loc, wait_counter + layer)
+                  for layer in range(self.firewall.depth)):
+            wait_counter += 1
         return(wait_counter)
 
     def reset(self):
@@ -305,7 +305,7 @@ class packet():
             self.advance_time()
 
     def get_packet_trip_severity(self):
-        self.advance_through_firewall()
+        self.packet_detections = self.trip_detections()
         severity = sum(detec['layer'] * detec['range'] for detec in self.packet_detections)
         return severity
 
@@ -314,7 +314,71 @@ def set_gcd(items):
     return reduce(gcd, items)
 
 
-def get_wait_time(firewall_parameters):
+def lcm(a, b):
+    return a * b // gcd(a, b)
+
+
+def forbidden_residues(firewall_parameters):
+    # A delay w is caught by a layer when (w + layer) % cycle_time == 0, so each layer forbids one residue
+    forbidden = {}
+    for layer, width in firewall_parameters:
+        cycle_time = max(1, 2 * (width - 1))
+        forbidden.setdefault(cycle_time, set()).add((-layer) % cycle_time)
+    return(forbidden)
+
+
+def residue_sieve(forbidden, max_period=None):
+    # Combines moduli into one bitset of allowed residues while the LCM period stays within max_period
+    period = 1
+    allowed = np.ones(1, dtype=bool)
+    remaining = []
+    for cycle_time in sorted(forbidden):
+        new_period = lcm(period, cycle_time)
+        if max_period is not None and new_period > max_period:
+            remaining.append(cycle_time)
+            continue
+        mask = np.ones(cycle_time, dtype=bool)
+        mask[list(forbidden[cycle_time])] = False
+        allowed = np.tile(allowed, new_period // period) & np.tile(mask, new_period // cycle_time)
+        period = new_period
+    return((period, np.flatnonzero(allowed), remaining))
+
+
+def valid_delays(firewall_parameters, max_period=2**24):
+    # Lazily yields every safe delay within one full LCM period, in increasing order; all others are
+    # these plus multiples of the period. Only moduli whose combined period fits max_period are sieved,
+    # the rest are checked per candidate.
+    forbidden = forbidden_residues(firewall_parameters)
+    period, residues, remaining = residue_sieve(forbidden, max_period)
+    full_period = reduce(lcm, remaining, period)
+    residues = residues.tolist()
+    for base in range(0, full_period, period):
+        for residue in residues:
+            w = base + residue
+            if all(w % cycle_time not in forbidden[cycle_time] for cycle_time in remaining):
+                yield(w)
+
+
+def get_wait_time(firewall_parameters, max_period=2**24):
+    return(next(valid_delays(firewall_parameters, max_period), None))
+
+
+def block_wait_time(firewall_parameters, block_size=2**20):
+    # Tests block_size candidate delays at once, filtering survivors layer by layer (shortest cycles first)
+    params = sorted(((max(1, 2 * (width - 1)), layer) for layer, width in firewall_parameters))
+    full_period = reduce(lcm, (cycle_time for cycle_time, layer in params), 1)
+    for start in range(0, full_period, block_size):
+        survivors = np.arange(start, min(start + block_size, full_period), dtype=np.int64)
+        for cycle_time, layer in params:
+            survivors = survivors[(survivors + layer) % cycle_time != 0]
+            if not len(survivors):
+                break
+        if len(survivors):
+            return(int(survivors[0]))
+    return(None)
+
+
+def brute_force_wait_time(firewall_parameters):
     params = [[layer, width, 2 * (width - 1)] for layer, width in firewall_parameters]
 
     w = 0
@@ -336,9 +400,21 @@ if __name__ == "__main__":
     test_firewall = firewall(test_firewall_parameters)
     test_packet = packet(test_firewall)
     assert test_packet.get_packet_trip_severity() == 24
+    assert test_packet.find_shortest_wait() == 10
+    test_packet.reset()
+    test_packet.advance_through_firewall()
+    assert test_packet.packet_detections == [{'layer': 0, 'range': 3}, {'layer': 6, 'range': 4}]
+    test_firewall.regress_time()
+    assert [layer.scanner_location for layer in test_firewall.layers[:2]] == [2, 0]
+    assert test_packet.find_shortest_wait() == 10
+    assert get_wait_time(test_firewall_parameters) == brute_force_wait_time(test_firewall_parameters) == 10
+    assert get_wait_time(test_firewall_parameters, max_period=4) == 10
+    assert list(valid_delays(test_firewall_parameters)) == list(valid_delays(test_firewall_parameters, max_period=4)) == [10]
+    assert block_wait_time(test_firewall_parameters, block_size=3) == 10
 
     firewall_parameters = load_firewall_paramaters('input.txt')
     _firewall = firewall(firewall_parameters)
     _packet = packet(_firewall)
     print('Severity:', _packet.get_packet_trip_severity())
     print('Wait Time:', get_wait_time(firewall_parameters))
+    assert block_wait_time(firewall_parameters) == get_wait_time(firewall_parameters)
@@ -50,7 +50,13 @@ Of particular interest is the region marked 8; while it does not appear contiguo
 How many regions are present given your key string?
 
 """
+import hashlib
+import mmap
+import os
+import tempfile
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 def circle_hash(instructions, circle_length=256):
     circle = [i for i in range(0, circle_length)]
@@ -129,22 +135,109 @@ def binary_hash(input_str, num_bits, *args, **kwargs):
     return ''.join([convert_to_binary(char, 16, num_bits) for char in _hash])
 
 
-def build_grid(seed, num_bits, size):
+def build_row(seed, num_bits, density_length, i):
+    eval_str = '-'.join([seed, str(i)])
+    return(binary_hash(eval_str, num_bits, density_length))
+
+
+def build_grid(seed, num_bits, size, n_rows=None):
+    density_length = int(size / num_bits)
+    n_rows = size if n_rows is None else n_rows
+    for i in range(0, n_rows):
+        yield(build_row(seed, num_bits, density_length, i))
+
+
+def parallel_build_grid(seed, num_bits, size, n_rows=None, max_workers=None, chunksize=16):
+    # Rows are hashed in a process pool and yielded in order
     density_length = int(size / num_bits)
-    for i in range(0, size):
-        eval_str = '-'.join([seed, str(i)])
-        row = binary_hash(eval_str, num_bits, density_length)
-        yield(row)
+    n_rows = size if n_rows is None else n_rows
+    row_builder = partial(build_row, seed, num_bits, density_length)
+    with ProcessPoolExecutor(max_workers) as pool:
+        for row in pool.map(row_builder, range(0, n_rows), chunksize=chunksize):
+            yield(row)
+
 
+def build_packed_row(seed, num_bits, density_length, i):
+    # Same per-digit expansion as build_row; below 4 bits a digit can overflow its field, so rows have no fixed width
+    if num_bits < 4:
+        raise ValueError('packed rows need num_bits >= 4, got {}'.format(num_bits))
+    return(int(build_row(seed, num_bits, density_length, i), 2))
 
-def grid_counter(seed, num_bits, size):
-    count = 0
-    grid_generator = build_grid(seed, num_bits, size)
-    i = 0
-    for row in grid_generator:
-        i += 1
-        count += sum(int(j) for j in row if j == '1')
-    return(count)
+
+def build_packed_grid(seed, num_bits, size, n_rows=None):
+    # Each row is held as a single int whose bits are the grid squares
+    density_length = int(size / num_bits)
+    n_rows = size if n_rows is None else n_rows
+    for i in range(0, n_rows):
+        yield(build_packed_row(seed, num_bits, density_length, i))
+
+
+class grid_cache():
+    # Packed grids keyed by (seed, num_bits, size), held in memory and optionally written to a directory
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.grids = {}
+
+    def grid_file(self, key):
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest() + '.grid'
+        return(os.path.join(self.directory, name))
+
+    def get(self, seed, num_bits, size):
+        key = (seed, num_bits, size)
+        if key in self.grids:
+            return(self.grids[key])
+
+        row_bytes = (size + 7) // 8
+        file = self.grid_file(key) if self.directory else None
+        if file and os.path.exists(file) and os.path.getsize(file) == size * row_bytes:
+            with open(file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                grid = [int.from_bytes(mapped[i:i + row_bytes], 'big') for i in range(0, len(mapped), row_bytes)]
+        else:
+            grid = list(build_packed_grid(seed, num_bits, size))
+            if file:
+                # Written to a temporary file and renamed, so an interrupted write never leaves a short grid
+                fd, temp_file = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(b''.join(row.to_bytes(row_bytes, 'big') for row in grid))
+                    os.replace(temp_file, file)
+                except BaseException:
+                    os.remove(temp_file)
+                    raise
+
+        self.grids[key] = grid
+        return(grid)
+
+
+def grid_counter(seed, num_bits, size, cache=None):
+    grid = cache.get(seed, num_bits, size) if cache else build_packed_grid(seed, num_bits, size)
+    return(sum(bin(row).count('1') for row in grid))
+
+
+def packed_region_counter(grid):
+    # Flood fills whole row masks at a time: grow a mask sideways within its row, then seed the rows above and below
+    remaining = list(grid)
+    n_y = len(remaining)
+    region_num = 0
+    for i in range(0, n_y):
+        while remaining[i]:
+            stack = [(i, remaining[i] & -remaining[i])]
+            while stack:
+                iy, mask = stack.pop()
+                mask &= remaining[iy]
+                if not mask:
+                    continue
+                grown = (mask | (mask << 1) | (mask >> 1)) & remaining[iy]
+                while grown != mask:
+                    mask = grown
+                    grown = (mask | (mask << 1) | (mask >> 1)) & remaining[iy]
+                remaining[iy] &= ~mask
+
+                for niy in (iy - 1, iy + 1):
+                    if 0 <= niy < n_y and mask & remaining[niy]:
+                        stack.append((niy, mask))
+            region_num += 1
+    return(region_num)
 
 
 def propagate_adjacency(grid, regions, ix, iy, region_num):
@@ -186,6 +279,57 @@ def region_counter(grid):
     return region_num - 1
 
 
+def find_label(parents, label):
+    while parents[label] != label:
+        parents[label] = parents[parents[label]]
+        label = parents[label]
+    return(label)
+
+
+def row_runs(row):
+    # Yields (first bit, last bit) of each run of set bits, lowest first
+    if isinstance(row, str):
+        row = int(row, 2)
+    while row:
+        low = row & -row
+        run = row & ~(row + low)
+        row &= ~run
+        yield((low.bit_length() - 1, run.bit_length() - 1))
+
+
+def streaming_region_counter(grid):
+    # Scanline labelling of runs with union-find on label equivalences. Only the previous
+    # row's runs are kept, and labels are compacted to their roots after every row.
+    parents = {}
+    prev_runs = []
+    next_label = 0
+    region_num = 0
+    for row in grid:
+        runs = []
+        for lo, hi in row_runs(row):
+            parents[next_label] = next_label
+            runs.append((lo, hi, next_label))
+            next_label += 1
+            region_num += 1
+
+        j = 0
+        for lo, hi, label in runs:
+            while j < len(prev_runs) and prev_runs[j][1] < lo:
+                j += 1
+            k = j
+            while k < len(prev_runs) and prev_runs[k][0] <= hi:
+                root1, root2 = find_label(parents, label), find_label(parents, prev_runs[k][2])
+                if root1 != root2:
+                    parents[root2] = root1
+                    region_num -= 1
+                k += 1
+
+        roots = {label: find_label(parents, label) for lo, hi, label in runs}
+        parents = {root: root for root in roots.values()}
+        prev_runs = [(lo, hi, roots[label]) for lo, hi, label in runs]
+    return(region_num)
+
+
 if __name__ == "__main__":
     assert convert_to_binary('0', 16, 4) == '0000'
     assert convert_to_binary('1', 16, 4) == '0001'
@@ -194,8 +338,17 @@ if __name__ == "__main__":
 
     test_input = "flqrgnkx"
     assert region_counter(build_grid(test_input, 4, 128)) == 1242
+    assert list(parallel_build_grid(test_input, 4, 128)) == list(build_grid(test_input, 4, 128))
+    assert grid_counter(test_input, 4, 128) == 8108
+    assert packed_region_counter(build_packed_grid(test_input, 4, 128)) == 1242
+    assert streaming_region_counter(build_grid(test_input, 4, 128)) == 1242
+    assert streaming_region_counter(build_packed_grid(test_input, 4, 128)) == 1242
+    assert streaming_region_counter(['101', '111', '000', '010']) == 2
+    assert packed_region_counter(build_packed_grid(test_input, 8, 128)) == region_counter(build_grid(test_input, 8, 128))
+    assert grid_counter(test_input, 8, 128) == sum(row.count('1') for row in build_grid(test_input, 8, 128))
 
     puzzle_input = "jxqlasbh"
-    count = grid_counter(puzzle_input, 4, 128)
+    cache = grid_cache()
+    count = grid_counter(puzzle_input, 4, 128, cache)
     print(count)
-    print(region_counter(build_grid(puzzle_input, 4, 128)))
+    print(packed_region_counter(cache.get(puzzle_input, 4, 128)))
@@ -30,10 +30,12 @@ memory to allocate to these operations. For example, in the above instructions,
 (in register c after the third instruction was evaluated).
 
 """
+import operator
+from concurrent.futures import ProcessPoolExecutor
 
 
 def line_reader(file):
-    action_map = {'inc': lambda x, y: x + y, 'dec': lambda x, y: x - y}
+    action_map = {'inc': operator.add, 'dec': operator.sub}
     with open(file, 'r') as f:
         for line in f:
             vals = line.strip().split()
@@ -64,9 +66,46 @@ def evaluate_instructions(instructions):
     return((final_max_val, abs_max_val))
 
 
+def find_root(parents, register):
+    while parents[register] != register:
+        parents[register] = parents[parents[register]]
+        register = parents[register]
+    return(register)
+
+
+def slice_instructions(instructions):
+    # Union-find over register names; instructions sharing no registers can run independently
+    instructions = list(instructions)
+    parents = {}
+    for instruction in instructions:
+        reg1 = parents.setdefault(instruction['register'], instruction['register'])
+        reg2 = parents.setdefault(instruction['cond_register'], instruction['cond_register'])
+        root1, root2 = find_root(parents, reg1), find_root(parents, reg2)
+        if root1 != root2:
+            parents[root2] = root1
+
+    slices = {}
+    for instruction in instructions:
+        slices.setdefault(find_root(parents, instruction['register']), []).append(instruction)
+    return(list(slices.values()))
+
+
+def evaluate_sliced_instructions(instructions, max_workers=None):
+    slices = slice_instructions(instructions)
+    with ProcessPoolExecutor(max_workers) as pool:
+        results = list(pool.map(evaluate_instructions, slices))
+
+    final_max_val = max(result[0] for result in results)
+    abs_max_val = max(result[1] for result in results)
+    return((final_max_val, abs_max_val))
+
+
 if __name__ == "__main__":
     import timeit
     assert evaluate_instructions(line_reader('test_input.txt'))[0] == 1
     assert evaluate_instructions(line_reader('test_input.txt'))[1] == 10
 
+    assert evaluate_sliced_instructions(line_reader('test_input.txt')) == (1, 10)
+    assert evaluate_sliced_instructions(line_reader('input.txt')) == evaluate_instructions(line_reader('input.txt'))
+
     print(evaluate_instructions(line_reader('input.txt')))
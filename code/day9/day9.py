@@ -55,6 +55,17 @@ To prove you've removed it, you need to count all of the characters within the g
 <{o"i!a,<{i<a>, 10 characters.
 How many non-canceled characters are within the garbage in your puzzle input?
 """
+import itertools
+import mmap
+import os
+import re
+import sys
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+
+ESCAPE_PATTERN = re.compile(rb'!.', flags=re.DOTALL)
+TRASH_PATTERN = re.compile(rb'<[^>]*>')
+NON_BRACES = bytes(i for i in range(256) if i not in b'{}')
 
 
 def input_reader(file):
@@ -64,64 +75,214 @@ def input_reader(file):
                 yield(letter)
 
 
-def count_groups(group):
-    nest_level = 0
-    accumulator = 0
-    for g in group:
-        if g == "{":
-            nest_level += 1
-        elif g == "}":
-            accumulator += nest_level
-            nest_level -= 1
+def block_reader(file=None, block_size=2**20):
+    # Yields fixed-size byte blocks: read from a memory-mapped file, or buffered reads from stdin when no file is given
+    if file is None:
+        while True:
+            block = sys.stdin.buffer.read(block_size)
+            if not block:
+                return
+            yield(block)
 
-    return(accumulator)
+    if os.path.getsize(file) == 0:
+        return
+    with open(file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        # Blocks are bytes copies of at most block_size, so callers may keep them after the map is closed
+        for start in range(0, len(mapped), block_size):
+            yield(mapped[start:start + block_size])
 
 
-def stream_counter(char_stream):
+def scan_chunk(char_stream, in_trash=False, skip=False):
+    # Scores are relative to the depth on entry: the true score is accumulator + entry_depth * closed_groups
+    if isinstance(char_stream, (bytes, bytearray, memoryview)):
+        bang, trash_close, trash_open, group_open, group_close = b'!><{}'
+    else:
+        bang, trash_close, trash_open, group_open, group_close = '!><{}'
     open_groups = 0
+    closed_groups = 0
     accumulator = 0
-    in_trash = False
-    discovered_group = ''
     discovered_trash = 0
-    skip = False
 
     for char in char_stream:
         if skip:
             skip = False
             continue
-        if char == "!":
+        if char == bang:
             skip = True
             continue
         if in_trash:
-            if char == ">":
+            if char == trash_close:
                 in_trash = False
             else:
-                in_trash = True
                 discovered_trash += 1
             continue
-        if char == '<':
+        if char == trash_open:
             in_trash = True
             continue
-        if char == "{":
+        if char == group_open:
             open_groups += 1
-            discovered_group += char
             continue
-        if char == "}":
+        if char == group_close:
+            # A closing group scores its own depth, so no group text needs to be kept
+            accumulator += open_groups
+            closed_groups += 1
             open_groups -= 1
-            discovered_group += char
-        if open_groups == 0:
-            accumulator += count_groups(discovered_group)
-            discovered_group = ''
 
+    return((in_trash, skip, open_groups, closed_groups, accumulator, discovered_trash))
+
+
+def regex_counter(text):
+    if not isinstance(text, (str, bytes, bytearray)):
+        text = ''.join(text)
+    if isinstance(text, str):
+        text = text.encode('utf-8')
+    # '!!' always cancels itself, so only lone '!' need the regex pass
+    text = b''.join(ESCAPE_PATTERN.split(text.replace(b'!!', b'')))
+    trash = TRASH_PATTERN.split(text)
+    stripped = b''.join(trash)
+    discovered_trash = len(text) - len(stripped) - 2 * (len(trash) - 1)
+
+    # Each run of '{' between closing braces raises the depth; the k-th '}' closes at (opens so far) - k
+    braces = stripped.translate(None, NON_BRACES)
+    opens = list(map(len, braces.split(b'}')))[:-1]
+    n_closed = len(opens)
+    accumulator = sum(itertools.accumulate(opens)) - n_closed * (n_closed - 1) // 2
+    return((accumulator, discovered_trash))
+
+
+def state_counter(char_stream):
+    accumulator, discovered_trash = scan_chunk(char_stream)[4:]
+    return((accumulator, discovered_trash))
+
+
+ENGINES = {'state': state_counter, 'regex': regex_counter}
+
+
+def stream_counter(char_stream, engine='state'):
+    return(ENGINES[engine](char_stream))
+
+
+def benchmark_engines(size=100 * 2**20, file='input.txt', number=1):
+    with open(file, 'rb') as f:
+        group = f.read().strip()
+    stream = b'{' + b','.join([group] * max(1, size // len(group))) + b'}'
+    assert stream_counter(stream, engine='regex') == stream_counter(stream, engine='state')
+
+    for engine in ENGINES:
+        elapsed = timeit.timeit(lambda: stream_counter(stream, engine=engine), number=number) / number
+        print(engine, '{:.2f}s'.format(elapsed), '{:.1f}MB/s'.format(len(stream) / elapsed / 2**20))
+
+
+class stream_scorer():
+    def __init__(self, state=None):
+        self.in_trash = False
+        self.skip = False
+        self.open_groups = 0
+        self.accumulator = 0
+        self.discovered_trash = 0
+        if state:
+            self.__dict__.update(state)
+
+    def feed(self, chunk):
+        in_trash, skip, depth_change, closed_groups, chunk_score, chunk_trash = scan_chunk(chunk, self.in_trash, self.skip)
+        self.accumulator += chunk_score + self.open_groups * closed_groups
+        self.discovered_trash += chunk_trash
+        self.open_groups += depth_change
+        self.in_trash = in_trash
+        self.skip = skip
+
+    def snapshot(self):
+        return({'in_trash': self.in_trash, 'skip': self.skip, 'open_groups': self.open_groups,
+                'accumulator': self.accumulator, 'discovered_trash': self.discovered_trash})
+
+    def result(self):
+        return((self.accumulator, self.discovered_trash))
+
+
+def block_stream_counter(blocks):
+    scorer = stream_scorer()
+    for block in blocks:
+        scorer.feed(block)
+    return(scorer.result())
+
+
+def summarise_chunk(file, start, end):
+    with open(file, 'rb') as f:
+        f.seek(start)
+        chunk = f.read(end - start).replace(b'\n', b'')
+
+    # Scans from the four entry states share work: each window is scanned once per distinct state, and
+    # once every entry has reached the same state the rest of the chunk is scanned a single time
+    summaries = {(in_trash, skip): (in_trash, skip, 0, 0, 0, 0) for in_trash in (False, True) for skip in (False, True)}
+    pos = 0
+    window = 64
+    while pos < len(chunk):
+        states = set(summary[:2] for summary in summaries.values())
+        if len(states) == 1:
+            window = len(chunk) - pos
+        scans = {state: scan_chunk(chunk[pos:pos + window], *state) for state in states}
+        summaries = {entry: compose_summaries(summary, scans[summary[:2]]) for entry, summary in summaries.items()}
+        pos += window
+        window *= 2
+    return(summaries)
+
+
+def compose_summaries(first, second):
+    in_trash, skip, depth_change, closed_groups, chunk_score, chunk_trash = second
+    return((in_trash, skip, first[2] + depth_change, first[3] + closed_groups,
+            first[4] + chunk_score + first[2] * closed_groups, first[5] + chunk_trash))
+
+
+def combine_summaries(summaries):
+    state = (False, False)
+    open_groups = 0
+    accumulator = 0
+    discovered_trash = 0
+    for summary in summaries:
+        in_trash, skip, depth_change, closed_groups, chunk_score, chunk_trash = summary[state]
+        accumulator += chunk_score + open_groups * closed_groups
+        discovered_trash += chunk_trash
+        open_groups += depth_change
+        state = (in_trash, skip)
     return((accumulator, discovered_trash))
 
 
+def parallel_stream_counter(file, chunk_size=2**20, max_workers=None):
+    file_size = os.path.getsize(file)
+    starts = range(0, file_size, chunk_size)
+    ends = [min(start + chunk_size, file_size) for start in starts]
+    with ProcessPoolExecutor(max_workers) as pool:
+        summaries = pool.map(summarise_chunk, itertools.repeat(file), starts, ends)
+        return(combine_summaries(summaries))
+
+
 if __name__ == "__main__":
-    # import timeit
     test_suite = {'{}': 1, '{{},{}}': 5, '{{{},{},{{}}}}': 16, '{{<!!>},{<!!>},{<!!>},{<!!>}}': 9}
     for k, v in test_suite.items():
         assert stream_counter(k)[0] == v
+        assert stream_counter(k.encode()) == stream_counter(k)
+        assert stream_counter(k, engine='regex') == stream_counter(k)
+    trash_suite = {'<>': 0, '<random characters>': 17, '<<<<>': 3, '<{!>}>': 2, '<!!>': 0, '<!!!>>': 0, '<{o"i!a,<{i<a>': 10}
+    for k, v in trash_suite.items():
+        assert stream_counter(k)[1] == v
+        assert stream_counter(k, engine='regex')[1] == v
+
+    assert parallel_stream_counter('input.txt', chunk_size=997) == stream_counter(input_reader('input.txt'))
+
+    assert block_stream_counter(block_reader('input.txt', block_size=997)) == stream_counter(input_reader('input.txt'))
+    assert block_stream_counter(list(block_reader('input.txt', block_size=100))) == stream_counter(input_reader('input.txt'))
+    partial_reader = block_reader('input.txt', block_size=100)
+    next(partial_reader)
+    partial_reader.close()
+    assert stream_counter(input_reader('input.txt'), engine='regex') == stream_counter(input_reader('input.txt'))
+
+    scorer = stream_scorer()
+    scorer.feed('{{<!>},{<a')
+    scorer = stream_scorer(scorer.snapshot())
+    scorer.feed('b>}}')
+    assert scorer.result() == stream_counter('{{<!>},{<ab>}}')
 
-    instruction_set = input_reader('input.txt')
+    if '--benchmark' in sys.argv:
+        benchmark_engines()
 
-    print(stream_counter(instruction_set))
+    print(block_stream_counter(block_reader('input.txt')))